@@ -12,7 +12,9 @@ APP_ID = f"th1nhhdk.localaiocr.{APP_VERSION}"
 
 # Used in src/ui/{control_panel,main_window}.py
 # Supported file extensions for Adding files and Drag and drop
-IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.heic', '.heif'}
+IMAGE_EXTENSIONS = frozenset({'.png', '.jpg', '.jpeg', '.webp', '.heic', '.heif'})
+# File dialog filter, sorted so the order is the same on every run
+IMAGE_FILTER = "Images (" + " ".join(f"*{ext}" for ext in sorted(IMAGE_EXTENSIONS)) + ")"
 
 # Determine base directory
 if getattr(sys, 'frozen', False):
@@ -27,6 +29,19 @@ else:
     # Running from source
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Used in src/file_handler.py and src/main.py
+# Memory for queue previews, shared by the encoded bytes cache and the decoded
+# pixmap cache (pixmaps are several times bigger for the same image)
+PREVIEW_CACHE_BUDGET = 256 * 1024 * 1024 # 256 MB
+PREVIEW_BYTES_CACHE_LIMIT = PREVIEW_CACHE_BUDGET // 4
+PREVIEW_PIXMAP_CACHE_LIMIT = PREVIEW_CACHE_BUDGET - PREVIEW_BYTES_CACHE_LIMIT
+
+# Used in src/transformers_service.py
+# Retries of an image after running out of memory, with exponential backoff (seconds)
+OCR_MAX_RETRIES = 3
+OCR_RETRY_BASE_DELAY = 1.0
+OCR_RETRY_MAX_DELAY = 8.0
+
 # Output directory for temporary images and crops
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 
@@ -2,6 +2,11 @@
 # Handles loading and preprocessing of images and PDF files for OCR.
 
 import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import fitz # PyMuPDF
 from PIL import Image # Pillow
 import pillow_heif # Handle HEIC images
@@ -13,27 +18,86 @@ pillow_heif.register_heif_opener()
 # Disable Pillow's safety limit for very large images (e.g. scanned documents)
 Image.MAX_IMAGE_PIXELS = None
 
+# LRU cache of loaded bytes, so re-selecting a queue item doesn't
+# decode/render the same file again: {(path, page_index, mtime, dpi, preview): bytes}
+BYTES_CACHE_LIMIT = config.PREVIEW_BYTES_CACHE_LIMIT
+_bytes_cache = OrderedDict()
+_bytes_cache_size = 0
+_bytes_cache_lock = threading.Lock()
+
+# Maximum dimension and JPEG quality of PDF pages rendered for the image viewer
+PREVIEW_MAX_DIM = 800
+PREVIEW_JPEG_QUALITY = 85
+
+# Open PDF documents reused across page extractions, so the xref table
+# isn't re-parsed for every page: {path: (mtime, fitz.Document)}
+DOC_CACHE_SIZE = 4
+_doc_cache = OrderedDict()
+# MuPDF documents aren't thread-safe, the loader and OCR threads share them
+_doc_lock = threading.RLock()
+
+# MuPDF's global store (fonts, decoded images...) is emptied every N page
+# renders, otherwise it keeps growing over a long batch
+STORE_SHRINK_INTERVAL = 10
+_render_count = 0
+
+# Number of queue items looked ahead of the one being OCR'd
+PREFETCH_AHEAD = 2
+
+
+def _flatten_alpha(img: Image.Image) -> Image.Image:
+    # Flatten transparency onto white, a plain convert('RGB') fills
+    # transparent areas with black and hides dark text.
+    # Done as one vectorized NumPy pass instead of Image.new() + paste().
+    # convert() always copies, even to the same mode, so skip it for RGBA
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    arr = np.asarray(img)
+    rgb = arr[..., :3].astype(np.uint16)
+    a = arr[..., 3:4].astype(np.uint16)
+    out = (rgb * a + (255 - a) * 255 + 127) // 255
+    return Image.fromarray(out.astype(np.uint8))
+
+def preprocess_rgb(img: Image.Image, fmt='PNG') -> bytes:
+    # Fast path of preprocess_image() for images known to be RGB already.
+
+    # Export as PNG bytes (lossless format preserves text quality)
+    # compress_level=1 is several times faster than Pillow's default (6),
+    # the slightly bigger output doesn't matter since it never leaves RAM.
+    img_buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        # Lossy but much faster to encode, only used for UI previews
+        img.save(img_buffer, format='JPEG', quality=PREVIEW_JPEG_QUALITY, optimize=False)
+    else:
+        img.save(img_buffer, format='PNG', compress_level=1, optimize=False)
+    return img_buffer.getvalue()
 
 # DeepSeek-OCR-2 handles image partitioning and cropping internally
 # using its `deepseek_vl_v2` dynamic resolution logic.
-def preprocess_image(img: Image.Image) -> bytes:
-    # Apply standard preprocessing and return PNG bytes.
+def preprocess_image(img: Image.Image, fmt='PNG') -> bytes:
+    # Apply standard preprocessing and return PNG (or JPEG) bytes.
     # We DO NOT resize or pad here because the transformers model needs the 
     # original high-resolution image to perform its own multi-view cropping.
+    if img.has_transparency_data:
+        img = _flatten_alpha(img)
 
     # Ensure RGB format
-    if img.mode != 'RGB':
+    elif img.mode != 'RGB':
         img = img.convert('RGB')
 
-    # Export as PNG bytes (lossless format preserves text quality)
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    return img_buffer.getvalue()
+    return preprocess_rgb(img, fmt)
 
 def get_image_bytes(filepath):
     # Read an image file, preprocess it, and return PNG bytes.
+    # PNG/JPEG files that are already plain RGB or grayscale without any
+    # transparency are returned as-is, decoding and re-encoding them gains nothing.
     try:
         with Image.open(filepath) as img:
+            # Image.open only parses the header (and PNG chunks such as tRNS),
+            # pixels aren't decoded unless preprocess_image() needs them
+            if img.format in ('PNG', 'JPEG') and img.mode in ('RGB', 'L') and 'transparency' not in img.info:
+                with open(filepath, "rb") as f:
+                    return f.read()
             return preprocess_image(img)
     except Exception as e:
         print(f"PIL failed to load {filepath} or process it: {e}")
@@ -41,44 +105,154 @@ def get_image_bytes(filepath):
         with open(filepath, "rb") as f:
             return f.read()
 
+def _get_doc(filepath):
+    # Return a cached open fitz.Document, reopening it if the file changed.
+    # Caller must hold _doc_lock.
+    mtime = os.path.getmtime(filepath)
+    entry = _doc_cache.get(filepath)
+    if entry is not None:
+        if entry[0] == mtime:
+            _doc_cache.move_to_end(filepath)
+            return entry[1]
+        del _doc_cache[filepath]
+        entry[1].close()
+
+    doc = fitz.open(filepath)
+    _doc_cache[filepath] = (mtime, doc)
+
+    # Close least recently used document
+    if len(_doc_cache) > DOC_CACHE_SIZE:
+        _, (_, old_doc) = _doc_cache.popitem(last=False)
+        old_doc.close()
+        # Release fonts/images MuPDF still keeps in its global store
+        fitz.TOOLS.store_shrink(100)
+
+    return doc
+
+def close_documents():
+    # Close all cached PDF documents, so the files aren't kept open
+    # (and locked against delete/rename on Windows) once they're not needed.
+    with _doc_lock:
+        while _doc_cache:
+            _, (_, doc) = _doc_cache.popitem()
+            doc.close()
+        fitz.TOOLS.store_shrink(100)
+
 def get_pdf_page_count(filepath):
     # Return the number of pages in a PDF without loading images.
     try:
-        doc = fitz.open(filepath)
-        count = len(doc)
-        doc.close()
-        return count
+        with _doc_lock:
+            return len(_get_doc(filepath))
     except Exception as e:
         print(f"Failed to get PDF page count for {filepath}: {e}")
         return 0
 
-def extract_pdf_page_bytes(filepath, page_index, target_dpi=144):
+def extract_pdf_page_bytes(filepath, page_index, target_dpi=144, preview=False):
     # Render a PDF page as an image, preprocess it, and return PNG bytes.
-    doc = fitz.open(filepath)
-    page = doc.load_page(page_index)
+    # preview=True renders at viewer resolution as JPEG instead (UI display only).
+    global _render_count
+    with _doc_lock:
+        page = _get_doc(filepath).load_page(page_index)
+
+        # Cap maximum dimension to prevent malloc errors
+        # 3500 Causes long freeze, 2000 causes infinite looping
+        MAX_DIM = 3000
+        rect = page.rect
+        width, height = rect.width, rect.height
+
+        # Calculate zoom based on DPI
+        # 144 / 72.0 (Default PDF DPI) = 2.0x zoom.
+        zoom = target_dpi / 72.0
+
+        # If 144 DPI results in a huge image (>3000px), scale down to fit MAX_DIM.
+        if (width * zoom > MAX_DIM) or (height * zoom > MAX_DIM):
+            zoom = MAX_DIM / max(width, height)
+        zoom = max(zoom, 0.5)  # Minimum 50% zoom to ensure readability
 
-    # Cap maximum dimension to prevent malloc errors
-    # 3500 Causes long freeze, 2000 causes infinite looping
-    MAX_DIM = 3000
-    rect = page.rect
-    width, height = rect.width, rect.height
+        # The image viewer is only a few hundred pixels wide,
+        # no need to render (and encode) the full OCR resolution for it.
+        if preview:
+            zoom = min(zoom, PREVIEW_MAX_DIM / max(width, height))
 
-    # Calculate zoom based on DPI
-    # 144 / 72.0 (Default PDF DPI) = 2.0x zoom.
-    zoom = target_dpi / 72.0
+        # fitz.Matrix applies uniform scaling in both dimensions
+        matrix = fitz.Matrix(zoom, zoom)
+        pix = page.get_pixmap(matrix=matrix, alpha=False)
+        page = None # Release the page so the store can drop its resources
 
-    # If 144 DPI results in a huge image (>3000px), scale down to fit MAX_DIM.
-    if (width * zoom > MAX_DIM) or (height * zoom > MAX_DIM):
-        zoom = MAX_DIM / max(width, height)
-    zoom = max(zoom, 0.5)  # Minimum 50% zoom to ensure readability
+        _render_count += 1
+        if _render_count % STORE_SHRINK_INTERVAL == 0:
+            fitz.TOOLS.store_shrink(100)
 
-    # fitz.Matrix applies uniform scaling in both dimensions
-    matrix = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=matrix, alpha=False)
+    if not pix.alpha:
+        # Already plain RGB: let MuPDF encode the image directly instead of
+        # copying the samples into a PIL Image just to re-encode them.
+        if preview:
+            img_bytes = pix.tobytes(output="jpg", jpg_quality=PREVIEW_JPEG_QUALITY)
+        else:
+            img_bytes = pix.tobytes(output="png")
+    else:
+        # Convert PyMuPDF pixmap to PIL Image, then preprocess.
+        # pix.samples_mv is a memoryview of the pixmap, NumPy and Pillow
+        # wrap it without the two full copies pix.samples + frombytes make.
+        arr = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        img = _flatten_alpha(Image.fromarray(arr))
+        img_bytes = preprocess_rgb(img, 'JPEG' if preview else 'PNG')
 
-    # Convert PyMuPDF pixmap to PIL Image, then preprocess
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    img_bytes = preprocess_image(img)
+    return img_bytes
 
-    doc.close()
-    return img_bytes
\ No newline at end of file
+def load_bytes(filepath, page_index, target_dpi=144, preview=False):
+    # Return image bytes for an image (page_index = -1) or a PDF page.
+    if page_index == -1:
+        return get_image_bytes(filepath)
+    return extract_pdf_page_bytes(filepath, page_index, target_dpi, preview)
+
+def get_cached_bytes(filepath, page_index, target_dpi=144, preview=False):
+    # Return image bytes for an image (page_index = -1) or a PDF page,
+    # reusing the previous result if the file hasn't been modified since.
+    global _bytes_cache_size
+    key = (filepath, page_index, os.path.getmtime(filepath), target_dpi, preview)
+
+    with _bytes_cache_lock:
+        img_bytes = _bytes_cache.get(key)
+        if img_bytes is not None:
+            _bytes_cache.move_to_end(key)
+            return img_bytes
+
+    img_bytes = load_bytes(filepath, page_index, target_dpi, preview)
+
+    with _bytes_cache_lock:
+        if key not in _bytes_cache:
+            _bytes_cache[key] = img_bytes
+            _bytes_cache_size += len(img_bytes)
+
+            # Evict least recently used entries (stale mtimes age out too)
+            while _bytes_cache_size > BYTES_CACHE_LIMIT and len(_bytes_cache) > 1:
+                _, old_bytes = _bytes_cache.popitem(last=False)
+                _bytes_cache_size -= len(old_bytes)
+
+    return img_bytes
+
+def prefetch_queue_bytes(queue_items, ahead=PREFETCH_AHEAD):
+    # Render the PDF pages among the next `ahead` (display_name, filepath, page_index)
+    # queue items on a background thread while the caller OCRs the current one
+    # (the model spends most of its time on the GPU without holding the GIL).
+    # Regular images aren't prefetched: the model reads them from their path,
+    # their bytes are only needed for crops.
+    # A thread and not processes: forking the GUI process copies its locks and
+    # open MuPDF documents, and spawned children re-import the whole app.
+    # Yields one Future per queue item in order, or None if the item wasn't
+    # prefetched (images, and the first item which is needed right away).
+    pool = None
+    futures = {}
+    try:
+        for i in range(len(queue_items)):
+            for j in range(i + 1, min(i + ahead + 1, len(queue_items))):
+                _, filepath, page_index = queue_items[j]
+                if page_index != -1 and j not in futures:
+                    if pool is None:
+                        pool = ThreadPoolExecutor(max_workers=1)
+                    futures[j] = pool.submit(extract_pdf_page_bytes, filepath, page_index)
+            yield futures.pop(i, None)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
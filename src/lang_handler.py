@@ -2,6 +2,7 @@
 
 import os
 import json
+import functools
 
 # Map display names to filenames
 LANGUAGES = {
@@ -24,6 +25,9 @@ def get_default_language():
 def get_available_languages():
     return LANGUAGES
 
+# Cached: switching back and forth between languages shouldn't re-read the file.
+# Callers must treat the returned dict as read-only, it is shared.
+@functools.lru_cache(maxsize=16)
 def load_language(lang_code):
     # Resolve path relative to this file
     base_dir = os.path.dirname(__file__)
@@ -10,7 +10,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from PySide6.QtWidgets import QApplication
-from PySide6.QtGui import QIcon
+from PySide6.QtGui import QIcon, QPixmapCache
+from PySide6.QtCore import QUrl, QThreadPool
+from PySide6.QtWebEngineWidgets import QWebEngineView
 from ui.main_window import MainWindow
 import config
 
@@ -25,12 +27,30 @@ def load_stylesheet(app):
         with open(style_path, "r") as f:
             app.setStyleSheet(f.read())
 
+def warm_up_webengine(window):
+    # Start WebEngine together with the window instead of on the first switch
+    # to the fancy output tab (which made the window flicker).
+    # A 1x1 view behind the central widget is enough, it's gone once loaded.
+    view = QWebEngineView(window)
+    view.setGeometry(0, 0, 1, 1)
+    view.lower()
+    view.loadFinished.connect(view.deleteLater)
+    view.load(QUrl("about:blank"))
+    view.show()
+
 def main():
     app = QApplication(sys.argv)
 
     # Load Theme
     load_stylesheet(app)
 
+    # Shared by all background work (OCR, model load/unload, PDF page counts...).
+    # At least 2 threads, so a running OCR batch never starves the small tasks.
+    QThreadPool.globalInstance().setMaxThreadCount(max(2, os.cpu_count() or 1))
+
+    # Room for decoded queue previews (in KB), see ControlPanel._start_load
+    QPixmapCache.setCacheLimit(config.PREVIEW_PIXMAP_CACHE_LIMIT // 1024)
+
     # Set program icon
     icon_path = os.path.join(current_dir, "res", "icon.png")
     if os.path.exists(icon_path):
@@ -45,6 +65,7 @@ def main():
             print(f"macOS model downloader error: {e}")
 
     window = MainWindow()
+    warm_up_webengine(window)
     # We have to use the whole screen...
     window.showMaximized()
 
@@ -1,5 +1,5 @@
 # src/ocr_worker.py
-# Background thread that processes images through the OCR AI model.
+# Background task that processes images through the OCR AI model.
 # Handles streaming output and parses grounding tags for bounding boxes.
 
 import time
@@ -8,17 +8,16 @@ import ast
 import os
 import io
 from PIL import Image, ImageOps
-from PySide6.QtCore import QThread, Signal, QUrl
+from PySide6.QtCore import QObject, QRunnable, Signal, QUrl
 from transformers_service import stream_ocr_response
 import file_handler
 import config
 import uuid
+import threading
 
 
-class OCRWorker(QThread):
+class OCRWorkerSignals(QObject):
     """
-    Worker thread that processes a queue of images through DeepSeek-OCR.
-
     Signals (events emitted to notify the main UI thread):
     - stream_chunk: Emits text as it's generated by DeepSeek-OCR
     - image_started: Emits when starting to process a new image
@@ -34,12 +33,21 @@ class OCRWorker(QThread):
     error_occurred = Signal(str)
     box_detected = Signal(list, str)
 
-    def __init__(self, queue_items, prompt, prompt_id=None):
+
+class OCRWorker(QRunnable):
+    """
+    Worker that processes a queue of images through DeepSeek-OCR
+    on a QThreadPool thread, emitting through an OCRWorkerSignals object.
+    """
+    def __init__(self, queue_items, prompt, prompt_id, signals):
         super().__init__()
+        # The caller keeps this object around to stop() it, Qt must not delete it
+        self.setAutoDelete(False)
         self.queue_items = queue_items 
         self.prompt = prompt
         self.prompt_id = prompt_id
-        self.is_running = True 
+        self.signals = signals
+        self.stop_event = threading.Event() # Set by stop(), checked for every chunk
 
         """
         Grounding mode determines how to handle grounding tags:
@@ -64,46 +72,60 @@ class OCRWorker(QThread):
 
     def run(self):
         # Main thread execution - processes each image in the queue
+        # Next PDF pages are rendered ahead on a background thread
+        prefetch = file_handler.prefetch_queue_bytes(self.queue_items)
         try:
             for i, (display_name, filepath, page_index) in enumerate(self.queue_items):
-                if not self.is_running: break 
+                prefetched = next(prefetch)
+                if self.stop_event.is_set(): break 
 
-                self.image_started.emit(display_name, i)
+                self.signals.image_started.emit(display_name, i)
 
                 start_time = time.time()
                 try:
                     is_temp_file = False
+                    img_bytes = None
+                    if prefetched is not None:
+                        try:
+                            img_bytes = prefetched.result()
+                        except Exception as e:
+                            # Load it again here, the error gets reported if it happens again
+                            print(f"Prefetching {display_name} failed: {e}")
+                    if img_bytes is None:
+                        img_bytes = file_handler.load_bytes(filepath, page_index)
+
                     if page_index == -1:
                         # Regular image file
-                        img_bytes = file_handler.get_image_bytes(filepath)
                         target_filepath = filepath
                     else:
                         # PDF page (page_index is 0-based)
-                        img_bytes = file_handler.extract_pdf_page_bytes(filepath, page_index)
-                        
                         # Create output dir if needed
                         os.makedirs(config.OUTPUT_DIR, exist_ok=True)
-                        temp_filename = f"temp_{uuid.uuid4().hex}.jpg"
+                        temp_filename = f"temp_{uuid.uuid4().hex}.png"
                         target_filepath = os.path.join(config.OUTPUT_DIR, temp_filename)
                         with open(target_filepath, "wb") as f:
                             f.write(img_bytes)
                         is_temp_file = True
                 except Exception as e:
-                    self.error_occurred.emit(f"Failed to load {display_name}: {e}")
+                    self.signals.error_occurred.emit(f"Failed to load {display_name}: {e}")
                     continue
 
                 # Process each chunk from the streaming AI response
                 self.buffer = ""
-                for chunk in stream_ocr_response(self.prompt, target_filepath):
-                    if not self.is_running: break 
-                    self.process_chunk(chunk, img_bytes)
-                    
-                if is_temp_file and os.path.exists(target_filepath):
-                    os.remove(target_filepath)
+                stream = stream_ocr_response(self.prompt, target_filepath)
+                try:
+                    for chunk in stream:
+                        if self.stop_event.is_set(): break
+                        self.process_chunk(chunk, img_bytes)
+                finally:
+                    # Aborts the generation if we stopped early or process_chunk raised
+                    stream.close()
+                    if is_temp_file and os.path.exists(target_filepath):
+                        os.remove(target_filepath)
 
                 # Flush any remaining text in buffer
                 if self.buffer:
-                    self.stream_chunk.emit(self.buffer)
+                    self.signals.stream_chunk.emit(self.buffer)
                     self.buffer = ""
 
                 duration = time.time() - start_time
@@ -111,13 +133,16 @@ class OCRWorker(QThread):
                 # Explicitly delete image bytes to free RAM immediately
                 del img_bytes 
 
-                if not self.is_running: break
-                self.image_finished.emit(display_name, duration)
-
-            self.finished_all.emit()
+                if self.stop_event.is_set(): break
+                self.signals.image_finished.emit(display_name, duration)
 
         except Exception as e:
-            self.error_occurred.emit(str(e))
+            self.signals.error_occurred.emit(str(e))
+        finally:
+            prefetch.close()
+            file_handler.close_documents()
+            # Always, the UI stays in processing state until this is received
+            self.signals.finished_all.emit()
 
     def process_chunk(self, chunk, img_bytes=None):
         """
@@ -128,7 +153,7 @@ class OCRWorker(QThread):
         """
         # Passthrough mode: no grounding tags expected, emit directly
         if self.grounding_mode is None:
-            self.stream_chunk.emit(chunk)
+            self.signals.stream_chunk.emit(chunk)
             return
 
         # Handle pending backspace from previous chunk
@@ -159,13 +184,13 @@ class OCRWorker(QThread):
             # Emit any text that appears before the tag
             prefix = self.buffer[:start]
             if prefix:
-                self.stream_chunk.emit(prefix)
+                self.signals.stream_chunk.emit(prefix)
 
             # --- Process the REF part ---
             # In 'ocr' mode, ref tags contain the actual OCR text - emit it
             if self.grounding_mode == 'ocr' and ref_content:
                 if ref_content.strip().lower() != 'image':
-                    self.stream_chunk.emit(ref_content)
+                    self.signals.stream_chunk.emit(ref_content)
 
             # Use 'grounding_mode' logic to decide on suppression
             # If 'markdown' mode, we suppress the label entirely.
@@ -179,14 +204,14 @@ class OCRWorker(QThread):
 
                 # Case 1: Single box [x1, y1, x2, y2]
                 if len(parsed_data) == 4 and all(isinstance(x, (int, float)) for x in parsed_data):
-                    self.box_detected.emit(parsed_data, ref_content or "")
+                    self.signals.box_detected.emit(parsed_data, ref_content or "")
                     valid_coords.append(parsed_data)
 
                 # Case 2: Multiple boxes [[x1, y1...], [x2, y2...]]
                 else:
                     for item in parsed_data:
                         if isinstance(item, list) and len(item) == 4:
-                            self.box_detected.emit(item, ref_content or "")
+                            self.signals.box_detected.emit(item, ref_content or "")
                             valid_coords.append(item)
             except Exception:
                 pass  # Invalid coordinates, ignore
@@ -223,7 +248,7 @@ class OCRWorker(QThread):
 
                         # Emit markdown tag so it renders inline and works well with clipboard
                         file_url = QUrl.fromLocalFile(crop_path).toString()
-                        self.stream_chunk.emit(f"\n![image]({file_url})\n")
+                        self.signals.stream_chunk.emit(f"\n![image]({file_url})\n")
                 except Exception as e:
                     print(f"Failed to crop image region: {e}")
 
@@ -258,12 +283,12 @@ class OCRWorker(QThread):
 
             safe_part = self.buffer[:start_idx]
             if safe_part:
-                self.stream_chunk.emit(safe_part)
+                self.signals.stream_chunk.emit(safe_part)
                 self.buffer = self.buffer[start_idx:]
 
             # Emergency flush if buffer gets too large
             if len(self.buffer) > MAX_BUFFER_SIZE:
-                self.stream_chunk.emit(self.buffer)
+                self.signals.stream_chunk.emit(self.buffer)
                 self.buffer = ""
             return
 
@@ -271,7 +296,7 @@ class OCRWorker(QThread):
 
         if last_open_angle == -1:
             # No '<' found - safe to emit entire buffer
-            self.stream_chunk.emit(self.buffer)
+            self.signals.stream_chunk.emit(self.buffer)
             self.buffer = ""
         else:
             tail = self.buffer[last_open_angle:]
@@ -294,18 +319,19 @@ class OCRWorker(QThread):
                 # Keep the tail in buffer, emit everything before it
                 safe_part = self.buffer[:last_open_angle]
                 if safe_part:
-                    self.stream_chunk.emit(safe_part)
+                    self.signals.stream_chunk.emit(safe_part)
                 self.buffer = tail
             else:
                 # No partial start tag. Safe to emit.
-                self.stream_chunk.emit(self.buffer)
+                self.signals.stream_chunk.emit(self.buffer)
                 self.buffer = ""
 
             # Emergency flush handled above for the ref case, but good to keep
             if len(self.buffer) > MAX_BUFFER_SIZE:
-                self.stream_chunk.emit(self.buffer)
+                self.signals.stream_chunk.emit(self.buffer)
                 self.buffer = ""
 
     def stop(self):
-        # Request the worker to stop processing (checked between images)
-        self.is_running = False
+        # Request the worker to stop processing,
+        # the image being processed is aborted at its next generated chunk
+        self.stop_event.set()
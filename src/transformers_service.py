@@ -6,13 +6,22 @@ import torch
 import gc
 import os
 from transformers import AutoModel, AutoTokenizer
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtCore import QObject, QRunnable, Signal
 import config
 
 # Global state to hold the model instance
 _model = None
 _tokenizer = None
 
+# Set to abort the running generation (checked on every generated token)
+_cancel_event = threading.Event()
+# Set once the running generation has produced text (retrying would repeat it)
+_output_started = threading.Event()
+
+
+class InferenceCancelled(Exception):
+    pass
+
 def load_model_if_needed():
     global _model, _tokenizer
     if _model is not None:
@@ -62,6 +71,10 @@ def load_model_if_needed():
             elif len(value.shape) > 1:
                 value = value[0]
 
+            # Stop generating as soon as the consumer doesn't want more output
+            if _cancel_event.is_set():
+                raise InferenceCancelled()
+
             if self.skip_prompt and self.next_tokens_are_prompt:
                 self.next_tokens_are_prompt = False
                 return
@@ -75,6 +88,8 @@ def load_model_if_needed():
 
             printable_text = text[self.print_len:]
             self.print_len += len(printable_text)
+            if printable_text:
+                _output_started.set()
             self.on_finalized_text(printable_text)
 
             # Clear cache on newline to prevent memory buildup
@@ -101,6 +116,22 @@ def unload_model():
         return True
     return False
 
+
+class StreamCapture:
+    # File-like object that replaces sys.stdout during inference,
+    # forwarding every write (one per generated piece of text) to a queue.
+    __slots__ = ('q',)
+
+    def __init__(self, q: queue.Queue):
+        self.q = q
+
+    def write(self, text: str):
+        self.q.put(text)
+
+    def flush(self):
+        pass
+
+
 def stream_ocr_response(prompt: str, image_file: str):
     """
     Generator that intercepts sys.stdout and yields tokens generated by model.infer().
@@ -110,14 +141,6 @@ def stream_ocr_response(prompt: str, image_file: str):
 
     output_queue = queue.Queue()
 
-    class StreamCapture:
-        def __init__(self, q):
-            self.q = q
-        def write(self, text):
-            self.q.put(text)
-        def flush(self):
-            pass
-
     original_stdout = sys.stdout
     capture = StreamCapture(output_queue)
     sys.stdout = capture
@@ -128,86 +151,121 @@ def stream_ocr_response(prompt: str, image_file: str):
 
     def run_inference():
         try:
-            _model.infer(
-                tokenizer=_tokenizer, 
-                prompt=prompt, 
-                image_file=image_file, 
-                output_path=config.OUTPUT_DIR,
-                base_size=1024, 
-                image_size=768, 
-                crop_mode=True,
-                save_results=False,
-                device=_model.device.type,
-                dtype=_model.dtype
-            )
+            for attempt in range(config.OCR_MAX_RETRIES + 1):
+                if _cancel_event.is_set():
+                    break
+                try:
+                    _model.infer(
+                        tokenizer=_tokenizer, 
+                        prompt=prompt, 
+                        image_file=image_file, 
+                        output_path=config.OUTPUT_DIR,
+                        base_size=1024, 
+                        image_size=768, 
+                        crop_mode=True,
+                        save_results=False,
+                        device=_model.device.type,
+                        dtype=_model.dtype
+                    )
+                    break
+                except InferenceCancelled:
+                    break
+                except Exception as e:
+                    # Running out of (V)RAM is often transient (e.g. another app
+                    # briefly used the GPU): free cached memory, back off and retry.
+                    # Only before any text was produced, so nothing gets repeated.
+                    is_oom = isinstance(e, torch.cuda.OutOfMemoryError) or "out of memory" in str(e).lower()
+                    if not is_oom or attempt == config.OCR_MAX_RETRIES or _output_started.is_set():
+                        raise
+
+                    print(f"Out of memory during inference, retrying ({attempt + 1}/{config.OCR_MAX_RETRIES})", file=sys.stderr)
+                    torch.cuda.empty_cache()
+                    gc.collect()
+                    # Wait on the cancel event instead of sleeping, so Stop ends the backoff right away
+                    if _cancel_event.wait(min(config.OCR_RETRY_MAX_DELAY, config.OCR_RETRY_BASE_DELAY * 2 ** attempt)):
+                        break
         except Exception as e:
             # We write errors to stderr so they don't get caught by stdout stream
             print(f"Error during inference: {e}", file=sys.stderr)
         finally:
             output_queue.put(None) # Sentinel to signal end
 
+    _cancel_event.clear()
+    _output_started.clear()
     thread = threading.Thread(target=run_inference)
     thread.start()
 
     debug_filters = ['PATCHES:', 'BASE:', 'directly resize', 'NO PATCHES', 'torch.Size', 'Loading']
     has_started_content = False
 
-    while True:
-        chunk = output_queue.get()
-        if chunk is None:
-            break
-
-        # A standard Python print() usually sends the string + \n in one write() call, 
-        # or at least the string itself in one chunk. We filter these exact chunks.
-        if any(s in chunk for s in debug_filters):
-            continue
-            
-        # DeepSeek prints exactly 21 equals signs as a separator
-        if chunk.strip() == "=====================":
-            continue
-
-        # Swallow lingering newlines from the filtered print() statements 
-        # until the actual model output begins.
-        if not has_started_content:
-            if not chunk.strip():
+    try:
+        while True:
+            chunk = output_queue.get()
+            if chunk is None:
+                break
+
+            # A standard Python print() usually sends the string + \n in one write() call, 
+            # or at least the string itself in one chunk. We filter these exact chunks.
+            if any(s in chunk for s in debug_filters):
+                continue
+                
+            # DeepSeek prints exactly 21 equals signs as a separator
+            if chunk.strip() == "=====================":
                 continue
-            has_started_content = True
-            chunk = chunk.lstrip()
-
-        yield chunk
-
-    sys.stdout = original_stdout
-
 
-class PreCheckWorker(QThread):
-    # Background thread to check connection and load model before processing.
+            # Swallow lingering newlines from the filtered print() statements 
+            # until the actual model output begins.
+            if not has_started_content:
+                if not chunk.strip():
+                    continue
+                has_started_content = True
+                chunk = chunk.lstrip()
+
+            yield chunk
+    finally:
+        # If the caller stopped reading early (generator closed),
+        # abort the generation instead of letting it run to the end,
+        # and only restore stdout once the inference thread is done with it.
+        _cancel_event.set()
+        thread.join()
+        sys.stdout = original_stdout
+
+
+class PreCheckSignals(QObject):
     # Emits (success, error_type, error_msg)
     # error_type: 'model' or None if success
     finished = Signal(bool, str, str)
 
-    def __init__(self):
+
+class PreCheckWorker(QRunnable):
+    # Background task to load model before processing.
+    def __init__(self, signals):
         super().__init__()
+        self.signals = signals
 
     def run(self):
         success = load_model_if_needed()
         if not success:
-            self.finished.emit(False, 'model', "Failed to load DeepSeek-OCR-2 into memory. Check console for details.")
+            self.signals.finished.emit(False, 'model', "Failed to load DeepSeek-OCR-2 into memory. Check console for details.")
             return
 
-        self.finished.emit(True, '', '')
+        self.signals.finished.emit(True, '', '')
 
 
-class ModelUnloadWorker(QThread):
-    # Background thread to unload the AI model from GPU memory.
+class ModelUnloadSignals(QObject):
     finished = Signal(bool, str)  # (success, message_key_or_error)
 
-    def __init__(self):
+
+class ModelUnloadWorker(QRunnable):
+    # Background task to unload the AI model from GPU memory.
+    def __init__(self, signals):
         super().__init__()
+        self.signals = signals
 
     def run(self):
         global _model
         if _model is not None:
             unload_model()
-            self.finished.emit(True, "msg_model_unloaded")
+            self.signals.finished.emit(True, "msg_model_unloaded")
         else:
-            self.finished.emit(True, "msg_model_not_loaded")
+            self.signals.finished.emit(True, "msg_model_not_loaded")
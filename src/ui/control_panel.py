@@ -4,16 +4,16 @@
 import os
 import random
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                               QListWidget, QFileDialog, QLabel,
+                               QListWidget, QListWidgetItem, QFileDialog, QLabel,
                                QProgressBar, QMessageBox, QDialog, QSpacerItem, QSizePolicy)
-from PySide6.QtCore import Signal, QTimer
-from PySide6.QtGui import QColor
+from PySide6.QtCore import Signal, QThreadPool
+from PySide6.QtGui import QColor, QPixmap, QPixmapCache
 
 import config
 import file_handler
 from .dialogs import PageRangeDialog
 from .image_viewer import ImageViewer
-from .image_loader import ImageLoaderThread
+from .image_loader import ImageLoaderSignals, ImageLoaderTask, PageCountSignals, PageCountTask
 
 
 class ControlPanel(QWidget):
@@ -26,23 +26,46 @@ class ControlPanel(QWidget):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
 
-        # Queue: list of (display_name, filepath, page_index) tuples
-        # page_index = -1 for images, 0+ for PDF pages
-        self.image_queue = []
+        # Queue: parallel lists of display names, file paths and page indices
+        # (one entry per row, no per-row tuples to build and unpack)
+        # page_index = -1 for images, 0+ for PDF pages,
+        # None for a PDF placeholder whose page count is still being read
+        self.q_names = []
+        self.q_paths = []
+        self.q_pages = []
+
+        # PDFs waiting for their page count: [(filepath, placeholder item)]
+        # Probed one at a time so page range dialogs show up in order
+        self._pdf_probe_queue = []
+        self._probe_token = 0 # Bumped on clear to discard in-flight probes
+        self.page_count_signals = PageCountSignals(self)
+        self.page_count_signals.finished.connect(self.on_page_count_ready)
 
         # Stores bounding boxes per image: {index: [(coords, color), ...]}
         self.image_boxes = {}
+
+        # Precomputed random vibrant box colors, R < 200, G < 200, B < 255
+        # Fixed seed: same colors on every run, no RNG calls per box
+        rng = random.Random(0)
+        self._palette = [QColor(rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 255))
+                         for _ in range(256)]
         self.current_processing_index = -1
         self.t = {} # Translation dictionary
 
-        self.loader_thread = None # Background thread for loading images
-
-        # Debounce timer to prevent RAM spikes when scrolling fast
-        # Without this scrolling too fast = 100% RAM usage
-        self.debounce_timer = QTimer()
-        self.debounce_timer.setSingleShot(True)
-        self.debounce_timer.setInterval(200) # Wait 200ms after selection settles
-        self.debounce_timer.timeout.connect(self._perform_load_image)
+        # Single long-lived background thread for loading images.
+        # Every load request gets a new token, results with an outdated
+        # token are discarded in on_image_loaded.
+        self.loader_pool = QThreadPool(self)
+        self.loader_pool.setMaxThreadCount(1)
+        self.loader_signals = ImageLoaderSignals(self)
+        self.loader_signals.image_loaded.connect(self.on_image_loaded)
+        self.loader_signals.error_occurred.connect(lambda e: print(f"Error loading image: {e}"))
+        self._load_token = 0
+        self._load_key = "" # QPixmapCache key of the image being loaded
+
+        # Selected row, kept in sync by on_queue_item_changed so hot paths
+        # don't have to ask the QListWidget every time
+        self._cur_row = -1
 
         # === Top Row: Add/Clear Buttons ===
         btn_layout = QHBoxLayout()
@@ -137,13 +160,14 @@ class ControlPanel(QWidget):
         self.update_status()
 
     def update_status(self):
-        count = len(self.image_queue)
+        pending = len(self._pdf_probe_queue)
+        count = len(self.q_pages) - pending
         if "btn_run_ready" in self.t:
             self.btn_run.setText(self.t["btn_run_ready"].format(count))
 
-        # Only enable Run if not currently processing
+        # Only enable Run if not currently processing and all PDFs are counted
         if not self.btn_stop.isEnabled():
-             self.btn_run.setEnabled(count > 0)
+             self.btn_run.setEnabled(count > 0 and pending == 0)
 
         # Navigation buttons enabled only if we have more than 1 item
         can_navigate = count > 1
@@ -163,20 +187,20 @@ class ControlPanel(QWidget):
 
     # ==================== Top Row: Add Images (Left) ====================
     def add_images(self):
-        # Build filter from config
-        ext_filter = "Images (" + " ".join(f"*{ext}" for ext in config.IMAGE_EXTENSIONS) + ")"
-        files, _ = QFileDialog.getOpenFileNames(self, self.t["btn_add_img"], "", ext_filter)
+        files, _ = QFileDialog.getOpenFileNames(self, self.t["btn_add_img"], "", config.IMAGE_FILTER)
         self.add_image_files(files)
 
     def add_image_files(self, filepaths):
         # Add image files to queue programmatically (used by dialog and drag/drop).
         for f in filepaths:
             name = os.path.basename(f)
-            self.image_queue.append((name, f, -1))  # -1 = not a PDF page
+            self.q_names.append(name)
+            self.q_paths.append(f)
+            self.q_pages.append(-1)  # -1 = not a PDF page
             self.list_widget.addItem(name)
 
         # Auto-select first item if nothing selected
-        if self.list_widget.currentRow() == -1 and self.list_widget.count() > 0:
+        if self._cur_row == -1 and self.list_widget.count() > 0:
             self.list_widget.setCurrentRow(0)
 
         self.update_status()
@@ -188,106 +212,157 @@ class ControlPanel(QWidget):
 
     def add_pdf_files(self, filepaths):
         # Add PDF files to queue programmatically (used by dialog and drag/drop).
+        # Page counts are read in the background, a placeholder row keeps
+        # each PDF's position in the queue until its pages are known.
+        was_idle = not self._pdf_probe_queue
         for f in filepaths:
-            try:
-                count = file_handler.get_pdf_page_count(f)
-                base_name = os.path.basename(f)
-                start_p, end_p = 1, count
-
-                # Show page range dialog for multi-page PDFs
-                if count >= 2:
-                    dlg = PageRangeDialog(base_name, count, self.t, self)
-                    if dlg.exec() == QDialog.Accepted:
-                        start_p, end_p = dlg.get_range()
-                    else:
-                        continue  # User cancelled
+            item = QListWidgetItem(self.t["lbl_counting_pages"].format(os.path.basename(f)))
+            self.q_names.append(item.text())
+            self.q_paths.append(f)
+            self.q_pages.append(None)
+            self.list_widget.addItem(item)
+            self._pdf_probe_queue.append((f, item))
+
+        if was_idle:
+            self._probe_next_pdf()
+
+        self.update_status()
 
-                # Add each selected page to queue
-                for i in range(start_p - 1, end_p):
+    def _probe_next_pdf(self):
+        if self._pdf_probe_queue:
+            f, _ = self._pdf_probe_queue[0]
+            QThreadPool.globalInstance().start(PageCountTask(f, self._probe_token, self.page_count_signals))
+
+    def on_page_count_ready(self, f, count, token):
+        # Callback when background page count completes:
+        # ask for page range and replace the placeholder with the pages.
+        if token != self._probe_token or not self._pdf_probe_queue:
+            return  # Queue was cleared meanwhile
+
+        _, item = self._pdf_probe_queue.pop(0)
+        row = self.list_widget.row(item)
+        # Before takeItem, which may change selection
+        del self.q_names[row]
+        del self.q_paths[row]
+        del self.q_pages[row]
+        self.list_widget.takeItem(row)
+
+        try:
+            base_name = os.path.basename(f)
+            start_p, end_p = 1, count
+            accepted = True
+
+            # Show page range dialog for multi-page PDFs
+            if count >= 2:
+                dlg = PageRangeDialog(base_name, count, self.t, self)
+                if dlg.exec() == QDialog.Accepted:
+                    start_p, end_p = dlg.get_range()
+                else:
+                    accepted = False  # User cancelled
+
+            # Add each selected page to queue, where the placeholder was
+            if accepted:
+                for offset, i in enumerate(range(start_p - 1, end_p)):
                     name = f"{base_name} :P{i+1}"
-                    self.image_queue.append((name, f, i))  # i = 0-based page index
-                    self.list_widget.addItem(name)
-            except Exception as e:
-                QMessageBox.critical(self, self.t["title_error"], str(e))
+                    self.q_names.insert(row + offset, name)
+                    self.q_paths.insert(row + offset, f)
+                    self.q_pages.insert(row + offset, i)  # i = 0-based page index
+                    self.list_widget.insertItem(row + offset, name)
+        except Exception as e:
+            QMessageBox.critical(self, self.t["title_error"], str(e))
 
-        if self.list_widget.currentRow() == -1 and self.list_widget.count() > 0:
+        # Inserting rows above the selection moves it without a change signal
+        self._cur_row = self.list_widget.currentRow()
+
+        if self._cur_row == -1 and self.list_widget.count() > 0:
             self.list_widget.setCurrentRow(0)
 
+        self._probe_next_pdf()
         self.update_status()
 
     # ==================== List Navigation ====================
     def move_selection_up(self):
-        row = self.list_widget.currentRow()
+        row = self._cur_row
         if row > 0:
             self.list_widget.setCurrentRow(row - 1)
 
     def move_selection_down(self):
-        row = self.list_widget.currentRow()
+        row = self._cur_row
         if row < self.list_widget.count() - 1:
             self.list_widget.setCurrentRow(row + 1)
 
     # ==================== Top Row: Clear (Right) ====================
     def clear_queue(self):
-        self.image_queue.clear()
+        self._pdf_probe_queue.clear()
+        self._probe_token += 1
+        self.q_names.clear()
+        self.q_paths.clear()
+        self.q_pages.clear()
         self.image_boxes.clear()
         self.list_widget.clear()
         self.image_viewer.scene.clear()
+        file_handler.close_documents()
+        QPixmapCache.clear()
         self.update_status()
 
     # ==================== Queue List ====================
     def on_queue_item_changed(self, current, previous):
         # Handle queue selection change - load image in background thread.
-        if not current:
+        row = self.list_widget.row(current) if current else -1
+        self._cur_row = row
+        if row < 0 or row >= len(self.q_pages):
             return
 
-        row = self.list_widget.row(current)
-        if row < 0 or row >= len(self.image_queue):
+        # Load immediately, no debounce: when scrolling fast, each new
+        # selection invalidates the previous load (outdated token) and drops
+        # it from the pool queue if it hasn't started, so at most one load
+        # runs and one waits at any time.
+        self._start_load(row)
+
+    def _start_load(self, row):
+        # Queue loading of the given row on the loader thread.
+        path = self.q_paths[row]
+        page_index = self.q_pages[row]
+
+        # Invalidate any pending load operation
+        self._load_token += 1
+        if page_index is None:
+            # PDF placeholder, nothing to show until its page count is read
+            self.image_viewer.scene.clear()
             return
 
-        name, path, page_index = self.image_queue[row]
-
-        # Cancel any pending load operation
-        if self.loader_thread is not None and self.loader_thread.isRunning():
-            self.loader_thread.cancel()
-            self.loader_thread = None
-
-        # Cancel pending debounce
-        self.debounce_timer.stop()
+        self.loader_pool.clear() # Drop queued loads that haven't started yet
 
-        # Check if we should load immediately or debounce
-        # If the user is just clicking once, we want it somewhat snappy,
-        # but if they are scrolling, we want to wait.
-        # For simplicity, always debounce slightly or just restart the timer.
-        self.debounce_timer.start()
-
-    def _perform_load_image(self):
-        # Called by timer to actually start loading
-        current = self.list_widget.currentItem()
-        if not current: return
-
-        row = self.list_widget.row(current)
-        if row < 0 or row >= len(self.image_queue): return
-
-        name, path, page_index = self.image_queue[row]
-
-        if self.loader_thread is not None and self.loader_thread.isRunning():
-             self.loader_thread.cancel()
+        # Already decoded before: display it right away, skip loading.
+        # Keyed on mtime like the bytes cache, so an edited file is loaded again.
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = 0 # Let the loader report the error
+        self._load_key = f"{path}:{page_index}:{mtime}"
+        pixmap = QPixmap()
+        if QPixmapCache.find(self._load_key, pixmap):
+            self.image_viewer.display_pixmap(pixmap)
+            self._restore_boxes(row)
+            return
 
-        self.loader_thread = ImageLoaderThread(path, page_index)
-        self.loader_thread.image_loaded.connect(lambda b: self.on_image_loaded(b, row))
-        self.loader_thread.error_occurred.connect(lambda e: print(f"Error loading image: {e}"))
-        self.loader_thread.start()
+        self.loader_pool.start(ImageLoaderTask(path, page_index, self._load_token, self.loader_signals))
 
-    def on_image_loaded(self, img_bytes, row):
+    def on_image_loaded(self, img_bytes, token):
         # Callback when background image load completes.
         # Ignore if user already switched to different item
-        if self.list_widget.currentRow() != row:
+        if token != self._load_token:
             return
 
         try:
-            self.image_viewer.display_image(img_bytes)
+            self.image_viewer.display_image(img_bytes, self._load_key)
+            self._restore_boxes(self._cur_row)
+        except Exception as e:
+            print(f"Error displaying loaded image: {e}")
 
-            # Restore any previously drawn bounding boxes for this image
+    def _restore_boxes(self, row):
+        # Restore any previously drawn bounding boxes for this image
+        try:
             if row in self.image_boxes:
                 for item in self.image_boxes[row]:
                     if len(item) == 3:
@@ -297,16 +372,17 @@ class ControlPanel(QWidget):
                         coords, color = item
                         self.image_viewer.draw_box(coords, color, "")
         except Exception as e:
-            print(f"Error displaying loaded image: {e}")
+            print(f"Error restoring bounding boxes: {e}")
 
     # ==================== Run Button (Left) ====================
     def on_start_click(self):
-        if not self.image_queue: return
+        if not self.q_pages: return
 
-        self.progress_bar.setMaximum(len(self.image_queue))
+        self.progress_bar.setMaximum(len(self.q_pages))
         self.progress_bar.setValue(0)
 
-        self.start_requested.emit(self.image_queue)
+        # Workers take (display_name, filepath, page_index) tuples
+        self.start_requested.emit(list(zip(self.q_names, self.q_paths, self.q_pages)))
 
     # ==================== Stop Button (Right) ====================
     def on_stop_click(self):
@@ -318,41 +394,25 @@ class ControlPanel(QWidget):
         # Clear boxes on first image (new batch)
         if index == 0:
             self.image_boxes.clear()
-            current_row = self.list_widget.currentRow()
-            if current_row >= 0 and current_row < len(self.image_queue):
-                _, path, page_index = self.image_queue[current_row]
-                if self.loader_thread is not None and self.loader_thread.isRunning():
-                    self.loader_thread.cancel()
-                self.loader_thread = ImageLoaderThread(path, page_index)
-                self.loader_thread.image_loaded.connect(lambda b: self.on_image_loaded(b, current_row))
-                self.loader_thread.start()
+            if 0 <= self._cur_row < len(self.q_pages):
+                self._start_load(self._cur_row)
 
         self.current_processing_index = index
         # Auto-scroll queue to currently processing item
         if 0 <= index < self.list_widget.count():
             self.list_widget.setCurrentRow(index)
 
-    def on_stream_chunk(self, text):
-        pass # Output is handled by OutputPanel
-
     def draw_box(self, coords, label=""):
         # Draw bounding box for current image and store for persistence.
         if self.current_processing_index == -1: return
 
-        # Generate random vibrant color
-        # R < 200, G < 200, B < 255
-        r = random.randint(0, 200)
-        g = random.randint(0, 200)
-        b = random.randint(0, 255)
-        color = QColor(r, g, b)
-
         # Store for redrawing when switching images
-        if self.current_processing_index not in self.image_boxes:
-            self.image_boxes[self.current_processing_index] = []
-        self.image_boxes[self.current_processing_index].append((coords, color, label))
+        boxes = self.image_boxes.setdefault(self.current_processing_index, [])
+        color = self._palette[len(boxes) % len(self._palette)]
+        boxes.append((coords, color, label))
 
         # Draw immediately if this image is currently visible
-        if self.list_widget.currentRow() == self.current_processing_index:
+        if self._cur_row == self.current_processing_index:
             self.image_viewer.draw_box(coords, color, label)
 
     # ==================== Progress Bar ====================
@@ -2,7 +2,7 @@
 # Widget that displays the current image with optional bounding boxes.
 
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsRectItem, QSizePolicy
-from PySide6.QtGui import QPixmap, QImage, QColor, QPen, QBrush, QPainter
+from PySide6.QtGui import QPixmap, QPixmapCache, QImage, QColor, QPen, QBrush, QPainter
 from PySide6.QtCore import Qt, QRectF
 
 class ImageViewer(QGraphicsView):
@@ -20,18 +20,26 @@ class ImageViewer(QGraphicsView):
         self.current_image_size = (0, 0)
         self.target_size = (1024, 1024) # Model's expected input size
 
-    def display_image(self, image_bytes):
+    def display_image(self, image_bytes, cache_key=None):
         # Load and display an image from bytes data.
-        self.scene.clear()
-        self.pixmap_item = None
-        self.current_image_size = (0, 0)
-
+        # If cache_key is given, the decoded pixmap is kept in QPixmapCache
+        # so displaying the same image again skips decoding.
         qt_img = QImage()
         if not qt_img.loadFromData(image_bytes):
+            self.scene.clear()
+            self.pixmap_item = None
+            self.current_image_size = (0, 0)
             return
 
-        self.current_image_size = (qt_img.width(), qt_img.height())
         pixmap = QPixmap.fromImage(qt_img)
+        if cache_key:
+            QPixmapCache.insert(cache_key, pixmap)
+        self.display_pixmap(pixmap)
+
+    def display_pixmap(self, pixmap):
+        # Display an already decoded image.
+        self.scene.clear()
+        self.current_image_size = (pixmap.width(), pixmap.height())
         self.pixmap_item = self.scene.addPixmap(pixmap)
         self.scene.setSceneRect(QRectF(pixmap.rect()))
         self.fit_content()
@@ -4,24 +4,44 @@
 import time
 import os
 import sys
+import functools
+import tempfile
+import uuid
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QLabel, QSplitter, QComboBox,
                                QMessageBox, QDialog, QDialogButtonBox, QLayout,
                                QGroupBox, QCheckBox, QFrame, QApplication)
-from PySide6.QtCore import Qt, Slot, QUrl, QTimer
-from PySide6.QtGui import QDesktopServices, QIcon
+from PySide6.QtCore import Qt, Slot, QUrl, QTimer, QThreadPool
+from PySide6.QtGui import QDesktopServices, QIcon, QKeySequence, QShortcut
 
 import config
 import lang_handler
-from ocr_worker import OCRWorker
-from transformers_service import ModelUnloadWorker, PreCheckWorker
+from ocr_worker import OCRWorker, OCRWorkerSignals
+from transformers_service import ModelUnloadWorker, ModelUnloadSignals, PreCheckWorker, PreCheckSignals
 from .control_panel import ControlPanel
+from .image_loader import ClipboardSaveSignals, ClipboardSaveTask
 from .output_panel import OutputPanel
 
 # Windows-specific feature
 if config.WIN_TASKBAR_PROGRESS_SUPPORT:
     from win_taskbar import TaskbarProgress
 
+# Resolved once at import instead of on every window/dialog creation
+_RES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "res")
+_ICON_PATH = os.path.join(_RES_DIR, "icon.png")
+_ICON_URL = QUrl.fromLocalFile(_ICON_PATH).toString() if os.path.exists(_ICON_PATH) else ""
+
+
+# Extension -> is_pdf, for classifying dropped files with a single lookup
+_EXT_BUCKET = dict.fromkeys(config.IMAGE_EXTENSIONS, False)
+_EXT_BUCKET['.pdf'] = True
+
+
+@functools.cache
+def _temp_dir():
+    # tempfile.gettempdir() checks the environment and the disk the first time
+    return tempfile.gettempdir()
+
 
 class MainWindow(QMainWindow):
     # ==================== Initialization ====================
@@ -35,39 +55,49 @@ class MainWindow(QMainWindow):
         self.taskbar = TaskbarProgress() if config.WIN_TASKBAR_PROGRESS_SUPPORT else None
 
         # Set Window Icon
-        icon_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "res", "icon.png")
-        if os.path.exists(icon_path):
-            self.setWindowIcon(QIcon(icon_path))
+        if _ICON_URL:
+            self.setWindowIcon(QIcon(_ICON_PATH))
 
         self.current_lang_code = lang_handler.get_default_language()
         self.t = lang_handler.load_language(self.current_lang_code)
+        # lang code -> ([(prompt id, label)], hash of those items, {prompt id: combo index})
+        self._prompt_combo_cache = {}
+        self._prompt_labels_hash = None # Hash of the items currently in combo_prompts
 
-        self.worker = None # OCR worker thread
-        self.unload_worker = None # Model unload worker thread
+        self.worker = None # Running OCR worker, kept to stop it
         self.batch_start_time = 0.0
-        self._first_show_done = False
+        self._about_dlg = None # Built on first show_about
+        self._drag_files = None # Classified URLs of the current drag, from dragEnterEvent
 
         self.auto_unload_timer = QTimer(self)
         self.auto_unload_timer.setSingleShot(True)
         self.auto_unload_timer.timeout.connect(self.unload_model)
 
+        # Streamed chunks are buffered and appended to the output in batches,
+        # one text layout per tick instead of one per token
+        self._pending_text = []
+        # Raw text written since the last fancy output block, see on_image_finished
+        self._unrendered_text = []
+        self.stream_flush_timer = QTimer(self)
+        self.stream_flush_timer.setInterval(20)
+        self.stream_flush_timer.timeout.connect(self._flush_stream_text)
+
+        # Taskbar progress is pushed at most every 100 ms, each update is a COM call
+        self._taskbar_dirty = False
+        self.taskbar_timer = QTimer(self)
+        self.taskbar_timer.setInterval(100)
+        self.taskbar_timer.timeout.connect(self._flush_taskbar_progress)
+
+        # Pasted images are saved to a temp file in the background
+        self.clipboard_signals = ClipboardSaveSignals(self)
+        self.clipboard_signals.saved.connect(self.on_clipboard_saved)
+        self.clipboard_signals.error_occurred.connect(self.on_clipboard_save_failed)
+
+        self.drop_overlay = None # Created in init_ui
         self.init_ui()
+        self.init_worker_signals()
         self.apply_language()
 
-    # ==================== Lifecycle ====================
-    def showEvent(self, event):
-        super().showEvent(event)
-        if not self._first_show_done:
-            self._first_show_done = True
-            # Delay GL init to after window is fully visible
-            QTimer.singleShot(0, self.force_gl_init)
-
-    def force_gl_init(self):
-        # HACK: Force WebEngine GL context initialization on startup.
-        # Prevents visual flicker when first switching to fancy output tab.
-        self.output_panel.tabs.setCurrentIndex(1)
-        QTimer.singleShot(0, lambda: self.output_panel.tabs.setCurrentIndex(0))
-
     # ==================== UI Layout ====================
     def init_ui(self):
         # Enable drag and drop on the main window
@@ -103,10 +133,10 @@ class MainWindow(QMainWindow):
         top_bar.addWidget(QLabel("Language:"))
         self.combo_lang = QComboBox()
         self.languages = lang_handler.get_available_languages()
+        self._code_to_name = {v: k for k, v in self.languages.items()}
         self.combo_lang.addItems(self.languages.keys())
 
-        display_name = next((k for k, v in self.languages.items() if v == self.current_lang_code), "English")
-        self.combo_lang.setCurrentText(display_name)
+        self.combo_lang.setCurrentText(self._code_to_name.get(self.current_lang_code, "English"))
         self.combo_lang.currentTextChanged.connect(self.change_language)
         top_bar.addWidget(self.combo_lang)
 
@@ -137,18 +167,44 @@ class MainWindow(QMainWindow):
         self.drop_overlay_label.setAlignment(Qt.AlignCenter)
         overlay_layout.addWidget(self.drop_overlay_label)
 
+        # === Keyboard Shortcuts ===
+        paste_shortcut = QShortcut(QKeySequence.Paste, self, context=Qt.WindowShortcut)
+        paste_shortcut.activated.connect(self.paste_from_clipboard)
+
+    def init_worker_signals(self):
+        # Background workers run on the shared QThreadPool and emit through
+        # these objects, which live (and are connected) as long as the window.
+        self.unload_signals = ModelUnloadSignals(self)
+        self.unload_signals.finished.connect(self.on_unload_finished)
+
+        self.precheck_signals = PreCheckSignals(self)
+        self.precheck_signals.finished.connect(self.on_precheck_finished)
+
+        # Connect worker signals -> UI updates
+        self.ocr_signals = OCRWorkerSignals(self)
+        self.ocr_signals.stream_chunk.connect(self._on_stream_chunk)
+        self.ocr_signals.box_detected.connect(self.control_panel.draw_box)
+        self.ocr_signals.error_occurred.connect(self._on_ocr_error)
+
+        self.ocr_signals.image_started.connect(self.on_image_started)
+        self.ocr_signals.image_finished.connect(self.on_image_finished)
+        self.ocr_signals.finished_all.connect(self.on_finished)
+
     # ==================== Top Bar: About (Left) ====================
     def show_about(self):
-        icon_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "res", "icon.png")
-        icon_url = QUrl.fromLocalFile(icon_path).toString()
+        # The dialog is built on first use and kept, until the language changes
+        if self._about_dlg is None:
+            self._about_dlg = self._build_about_dialog()
+        self._about_dlg.exec()
 
+    def _build_about_dialog(self):
         dlg = QDialog(self)
         dlg.setWindowTitle(self.t["about_title"])
 
         layout = QVBoxLayout(dlg)
         layout.setSizeConstraint(QLayout.SetFixedSize)
 
-        lbl_text = QLabel(self.t["about_text"].format(icon_url, config.APP_VERSION, config.APP_AUTHOR))
+        lbl_text = QLabel(self.t["about_text"].format(_ICON_URL, config.APP_VERSION, config.APP_AUTHOR))
         lbl_text.setTextFormat(Qt.RichText)
         layout.addWidget(lbl_text)
 
@@ -156,11 +212,11 @@ class MainWindow(QMainWindow):
         btn_gh = buttons.addButton(self.t["btn_about_git"], QDialogButtonBox.ActionRole)
 
         buttons.accepted.connect(dlg.accept)
-        btn_gh.clicked.connect(lambda: QDesktopServices.openUrl(QUrl(config.PROJECT_URL)))
+        btn_gh.clicked.connect(functools.partial(QDesktopServices.openUrl, QUrl(config.PROJECT_URL)))
 
         layout.addWidget(buttons)
 
-        dlg.exec()
+        return dlg
 
     # ==================== Top Bar: Unload ====================
     def unload_model(self):
@@ -168,9 +224,7 @@ class MainWindow(QMainWindow):
         self.btn_unload.setEnabled(False)
         self.btn_unload.setText(". . .")
 
-        self.unload_worker = ModelUnloadWorker()
-        self.unload_worker.finished.connect(self.on_unload_finished)
-        self.unload_worker.start()
+        QThreadPool.globalInstance().start(ModelUnloadWorker(self.unload_signals))
 
     @Slot(bool, str)
     def on_unload_finished(self, success, message):
@@ -185,43 +239,67 @@ class MainWindow(QMainWindow):
     # ==================== Top Bar: Language (Right) ====================
 
     def change_language(self, lang_name):
-        self.current_lang_code = self.languages[lang_name]
+        lang_code = self.languages[lang_name]
+        if lang_code == self.current_lang_code:
+            return
+        self.current_lang_code = lang_code
         self.t = lang_handler.load_language(self.current_lang_code)
-        self.apply_language()
+        # About dialog texts are baked in, build it again next time
+        if self._about_dlg is not None:
+            self._about_dlg.deleteLater()
+            self._about_dlg = None
+        self.retranslate_static()
+        self.rebuild_prompt_combo()
+        # Child panels are updated right after, so the combo box click returns immediately
+        QTimer.singleShot(0, self.retranslate_panels)
 
     def apply_language(self):
         # Apply translation strings to all UI elements.
+        self.retranslate_static()
+        self.rebuild_prompt_combo()
+        self.retranslate_panels()
+
+    def retranslate_static(self):
         # Top Bar
         self.btn_about.setText(self.t["btn_about"])
         self.btn_unload.setText(self.t["btn_unload"])
 
         self.lbl_prompt.setText(self.t["lbl_prompt"])
 
-        # Reload prompts dropdown while preserving selection
+        # Drop overlay
+        self.drop_overlay_label.setText(self.t["drop_overlay_text"])
+
+    def rebuild_prompt_combo(self):
+        # Reload prompts dropdown while preserving selection.
+        # Skipped when the labels are the same as the ones already shown.
+        cached = self._prompt_combo_cache.get(self.current_lang_code)
+        if cached is None:
+            prompt_items = list(self.t.get("prompt_labels", {}).items())
+            prompt_index = {pid: i for i, (pid, _) in enumerate(prompt_items)}
+            cached = (prompt_items, hash(tuple(prompt_items)), prompt_index)
+            self._prompt_combo_cache[self.current_lang_code] = cached
+
+        prompt_items, labels_hash, prompt_index = cached
+        if labels_hash == self._prompt_labels_hash:
+            return
+        self._prompt_labels_hash = labels_hash
+
         current_id = self.combo_prompts.currentData()
         self.combo_prompts.blockSignals(True) # Prevent change events during rebuild
         self.combo_prompts.clear()
-        if "prompt_labels" in self.t:
-            for pid, label in self.t["prompt_labels"].items():
-                self.combo_prompts.addItem(label, pid)
+        for pid, label in prompt_items:
+            self.combo_prompts.addItem(label, pid)
 
         # Restore selection or use default
-        if current_id:
-            index = self.combo_prompts.findData(current_id)
-            if index >= 0: self.combo_prompts.setCurrentIndex(index)
-        else:
-            index = self.combo_prompts.findData(config.DEFAULT_PROMPT)
-            if index >= 0: self.combo_prompts.setCurrentIndex(index)
+        index = prompt_index.get(current_id if current_id else config.DEFAULT_PROMPT, -1)
+        if index >= 0: self.combo_prompts.setCurrentIndex(index)
 
         self.combo_prompts.blockSignals(False)
 
-        # Update child panels
+    def retranslate_panels(self):
         self.control_panel.update_language(self.t)
         self.output_panel.update_language(self.t)
 
-        # Drop overlay
-        self.drop_overlay_label.setText(self.t["drop_overlay_text"])
-
     # ==================== Processing State ====================
     def set_processing_state(self, is_processing):
         # Toggle all UI elements between processing/idle states.
@@ -242,10 +320,8 @@ class MainWindow(QMainWindow):
         self._pending_queue = queue
         self._pending_pid = self.combo_prompts.currentData()
 
-        # Run pre-checks in background thread
-        self.precheck_worker = PreCheckWorker()
-        self.precheck_worker.finished.connect(self.on_precheck_finished)
-        self.precheck_worker.start()
+        # Run pre-checks in background
+        QThreadPool.globalInstance().start(PreCheckWorker(self.precheck_signals))
 
     @Slot(bool, str, str)
     def on_precheck_finished(self, success, error_type, error_msg):
@@ -260,8 +336,9 @@ class MainWindow(QMainWindow):
         self.start_processing(self._pending_queue, prompt_template, self._pending_pid)
 
     def start_processing(self, queue, prompt_template, prompt_id=None):
-        # Start OCR worker thread to process the queue.
+        # Start OCR worker to process the queue.
         self.output_panel.clear()
+        self._unrendered_text.clear()
 
         # Clean output folder
         try:
@@ -286,57 +363,89 @@ class MainWindow(QMainWindow):
         # Windows-specific taskbar progress indicator
         if self.taskbar:
             self.taskbar.set_progress(int(self.winId()), 0, len(queue))
+            self._taskbar_dirty = False
+            self.taskbar_timer.start()
 
-        self.worker = OCRWorker(queue, prompt_template, prompt_id)
-
-        # Connect worker signals -> UI updates
-        self.worker.stream_chunk.connect(self.output_panel.append_text)
-        self.worker.stream_chunk.connect(self.control_panel.on_stream_chunk)
-        self.worker.box_detected.connect(self.control_panel.draw_box)
-        self.worker.error_occurred.connect(lambda e: self.output_panel.append_text(f"\nERROR: {e}"))
-
-        self.worker.image_started.connect(self.on_image_started)
-        self.worker.image_finished.connect(self.on_image_finished)
-        self.worker.finished_all.connect(self.on_finished)
+        self.worker = OCRWorker(queue, prompt_template, prompt_id, self.ocr_signals)
 
-        self.worker.start()
+        self.stream_flush_timer.start()
+        QThreadPool.globalInstance().start(self.worker)
 
     def stop_processing(self):
-        if self.worker and self.worker.isRunning():
+        if self.worker is not None:
             self.worker.stop()
             # Windows taskbar progress indicator
             if self.taskbar:
+                self.taskbar_timer.stop()
                 self.taskbar.stop_progress(int(self.winId()))
 
     # ==================== Processing Callbacks ====================
+    @Slot(str)
+    def _on_stream_chunk(self, text):
+        self._pending_text.append(text)
+
+    def _flush_stream_text(self):
+        if self._pending_text:
+            self._write_output("".join(self._pending_text))
+            self._pending_text.clear()
+
+    def _append_output(self, text):
+        # Flush buffered chunks first so the output stays in order
+        self._flush_stream_text()
+        self._write_output(text)
+
+    def _write_output(self, text):
+        self.output_panel.append_text(text)
+        self._unrendered_text.append(text)
+
+    def _take_unrendered_text(self):
+        text = "".join(self._unrendered_text)
+        self._unrendered_text.clear()
+        return text
+
+    @Slot(str)
+    def _on_ocr_error(self, e):
+        self._append_output(f"\nERROR: {e}")
+
     @Slot(str, int)
     def on_image_started(self, display_name, index):
-        self.output_panel.append_text("\n")
+        self._append_output("\n")
         self.control_panel.on_process_started(index)
 
     @Slot(str, float)
     def on_image_finished(self, display_name, duration):
         self.control_panel.increment_progress()
-        self.output_panel.append_text("\n")
+        self._append_output("\n")
+        self.output_panel.append_fancy_block(self._take_unrendered_text())
 
-        # Update Windows taskbar progress
+        # Update Windows taskbar progress on the next timer tick
         if self.taskbar:
-            self.taskbar.set_progress(
-                int(self.winId()),
-                self.control_panel.progress_bar.value(),
-                self.control_panel.progress_bar.maximum()
-            )
+            self._taskbar_dirty = True
+
+    def _flush_taskbar_progress(self):
+        if not self._taskbar_dirty:
+            return
+        self._taskbar_dirty = False
+        self.taskbar.set_progress(
+            int(self.winId()),
+            self.control_panel.progress_bar.value(),
+            self.control_panel.progress_bar.maximum()
+        )
 
     @Slot()
     def on_finished(self):
         # Called when all images have been processed.
+        self.worker = None
+        self.stream_flush_timer.stop()
+        self._flush_stream_text()
         self.set_processing_state(False)
         self.control_panel.update_status()
         # Windows taskbar progress indicator
         if self.taskbar:
+            self.taskbar_timer.stop()
             self.taskbar.stop_progress(int(self.winId()))
 
-        self.output_panel.render_fancy_output()
+        self.output_panel.render_fancy_output(self._take_unrendered_text())
 
         # Show completion dialog with total time
         if self.control_panel.progress_bar.value() == self.control_panel.progress_bar.maximum():
@@ -350,24 +459,27 @@ class MainWindow(QMainWindow):
     # ==================== Drag and Drop ====================
     def resizeEvent(self, event):
         # Keep drop overlay sized to cover entire window.
+        # Only while shown, dragEnterEvent sizes it before showing it.
         super().resizeEvent(event)
-        if hasattr(self, 'drop_overlay'):
+        if self.drop_overlay is not None and self.drop_overlay.isVisible():
             self.drop_overlay.setGeometry(self.rect())
 
     def _validate_dropped_files(self, urls):
-        # Separate dropped files into images, PDFs, and invalid files.
-        images, pdfs, invalid = [], [], []
+        # Single pass over dropped URLs.
+        # Returns ([(path, is_pdf), ...] in drop order, [invalid paths]).
+        files, invalid = [], []
         for url in urls:
-            if url.isLocalFile():
-                path = url.toLocalFile()
-                ext = os.path.splitext(path)[1].lower()
-                if ext in config.IMAGE_EXTENSIONS:
-                    images.append(path)
-                elif ext == '.pdf':
-                    pdfs.append(path)
-                else:
-                    invalid.append(path)
-        return images, pdfs, invalid
+            if not url.isLocalFile():
+                continue
+            path = url.toLocalFile()
+            # rpartition instead of os.path.splitext: cheaper, same result for file names
+            _, dot, ext = path.rpartition('.')
+            is_pdf = _EXT_BUCKET.get((dot + ext).lower())
+            if is_pdf is None:
+                invalid.append(path)
+            else:
+                files.append((path, is_pdf))
+        return files, invalid
 
     def dragEnterEvent(self, event):
         # Accept drag if we're not processing and files contain valid types.
@@ -376,8 +488,10 @@ class MainWindow(QMainWindow):
             return
 
         if event.mimeData().hasUrls():
-            images, pdfs, _ = self._validate_dropped_files(event.mimeData().urls())
-            if images or pdfs:
+            # Kept for dropEvent, so the URLs are only classified once per drag
+            self._drag_files = self._validate_dropped_files(event.mimeData().urls())
+            files, _ = self._drag_files
+            if files:
                 event.acceptProposedAction()
                 self.drop_overlay.setGeometry(self.rect())
                 self.drop_overlay.show()
@@ -394,33 +508,24 @@ class MainWindow(QMainWindow):
     def dragLeaveEvent(self, event):
         # Hide overlay when drag leaves the window.
         self.drop_overlay.hide()
+        self._drag_files = None
 
-    def _process_urls(self, urls):
-        # Process files in order, batching consecutive images for efficiency
-        invalid = []
+    def _process_urls(self, urls, classified=None):
+        # Process files in order, batching consecutive images for efficiency.
+        # classified: result of _validate_dropped_files(urls) if already known.
+        files, invalid = classified or self._validate_dropped_files(urls)
         image_batch = []
-        file_count = 0
 
-        for url in urls:
-            if not url.isLocalFile():
-                continue
-
-            path = url.toLocalFile()
-            ext = os.path.splitext(path)[1].lower()
-
-            if ext in config.IMAGE_EXTENSIONS:
+        for path, is_pdf in files:
+            if not is_pdf:
                 image_batch.append(path)
-                file_count += 1
-            elif ext == '.pdf':
+            else:
                 # Flush pending images first to preserve order
                 if image_batch:
                     self.control_panel.add_image_files(image_batch)
                     image_batch = []
                 # Process PDF (may show dialog)
                 self.control_panel.add_pdf_files([path])
-                file_count += 1
-            else:
-                invalid.append(path)
 
         # Flush remaining images
         if image_batch:
@@ -431,7 +536,7 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, self.t["title_disclaimer"], self.t["drop_invalid_files"])
 
         # Show file order disclaimer ONLY when > 1 files dropped
-        if file_count > 1:
+        if len(files) > 1:
             QMessageBox.information(self, self.t["title_disclaimer"], self.t["drop_order_disclaimer"])
 
     def dropEvent(self, event):
@@ -441,16 +546,11 @@ class MainWindow(QMainWindow):
         if not event.mimeData().hasUrls():
             return
 
-        self._process_urls(event.mimeData().urls())
+        classified, self._drag_files = self._drag_files, None
+        self._process_urls(event.mimeData().urls(), classified)
         event.acceptProposedAction()
 
     # ==================== Keyboard Shortcuts ====================
-    def keyPressEvent(self, event):
-        if event.modifiers() == Qt.ControlModifier and event.key() == Qt.Key_V:
-            self.paste_from_clipboard()
-        else:
-            super().keyPressEvent(event)
-
     def paste_from_clipboard(self):
         if self.control_panel.btn_stop.isEnabled():
             return
@@ -463,12 +563,21 @@ class MainWindow(QMainWindow):
         elif mime_data.hasImage():
             image = clipboard.image()
             if not image.isNull():
-                import tempfile
                 from datetime import datetime
 
-                temp_dir = tempfile.gettempdir()
+                # Saves run concurrently, the uuid keeps two pastes in the same second apart
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                temp_path = os.path.join(temp_dir, f"local_ai_ocr_clipboard_{timestamp}.png")
+                temp_path = os.path.join(_temp_dir(), f"local_ai_ocr_clipboard_{timestamp}_{uuid.uuid4().hex[:8]}.png")
+
+                QThreadPool.globalInstance().start(ClipboardSaveTask(image, temp_path, self.clipboard_signals))
+
+    @Slot(str)
+    def on_clipboard_saved(self, path):
+        # Added even if processing started while the image was being saved.
+        # The running batch works on its own copy of the queue, so the image
+        # is only picked up by the next run.
+        self.control_panel.add_image_files([path])
 
-                if image.save(temp_path, "PNG"):
-                    self.control_panel.add_image_files([temp_path])
\ No newline at end of file
+    @Slot(str)
+    def on_clipboard_save_failed(self, path):
+        QMessageBox.critical(self, self.t["title_error"], self.t["msg_paste_failed"].format(path))
\ No newline at end of file
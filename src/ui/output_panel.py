@@ -4,6 +4,7 @@
 import os
 import re
 import html
+import json
 import markdown
 import pypandoc
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTabWidget, QPushButton, QLabel, QTextEdit, QMenu, QFileDialog, QMessageBox
@@ -88,6 +89,11 @@ class FancyOutput(QWebEngineView):
         super().__init__(parent)
         self.page().setBackgroundColor(Qt.white)
 
+        # Blocks appended before the page finished loading wait here
+        self._page_ready = False
+        self._pending_blocks = []
+        self.loadFinished.connect(self._on_load_finished)
+
     def _convert_to_html(self, raw_md):
         # 1. Extract and protect LaTeX blocks from markdown processing
         # Markdown would destroy LaTeX syntax, so we replace with placeholders
@@ -113,76 +119,107 @@ class FancyOutput(QWebEngineView):
 
         return html_content
 
-    def set_markdown(self, md_content):
-        # Convert markdown to HTML and render with MathJax.
-        if not md_content:
-            self.setHtml("")
-            return
+    def start_document(self):
+        # Load an empty page (with MathJax) that blocks get appended to.
+        self._set_page("")
 
+    def append_markdown(self, md_content):
+        # Render markdown and append it to the end of the current page,
+        # without reloading what was rendered before.
         try:
-            html_content = self._convert_to_html(md_content)
-
-            # 4. Setup MathJax
-            base_path = os.path.dirname(os.path.abspath(__file__))
-            project_path = os.path.dirname(base_path)
-            node_path = os.path.join(project_path, "res", "node")
-
-            mathjax_path = os.path.join(node_path, "mathjax", "tex-mml-svg.js")
-            mathjax_url = QUrl.fromLocalFile(mathjax_path).toString()
-            mathjax_dir_url = QUrl.fromLocalFile(os.path.dirname(mathjax_path)).toString()
-            node_path_url = QUrl.fromLocalFile(node_path).toString()
-
-            # Explicitly map the newcm font to ensure local loading
-            newcm_path = os.path.join(node_path, "@mathjax", "mathjax-newcm-font")
-            newcm_url = QUrl.fromLocalFile(newcm_path).toString()
-
-            # STUPID Hack: catch and replace cdn link with local path (setting paths doesn't work)
-            mathjax_script = f"""
-            <script>
-            MathJax = {{
-              loader: {{
-                paths: {{
-                  mathjax: '{mathjax_dir_url}',
-                  npm: '{node_path_url}',
-                  'mathjax-newcm-font': '{newcm_url}'
-                }},
-                pathFilters: [
-                  [(data) => {{
-                    var cdn = 'https://cdn.jsdelivr.net/npm/';
-                    if (data.name.indexOf(cdn) === 0) {{
-                        data.name = data.name.replace(cdn, '{node_path_url}/');
-                    }}
-                    return true;
-                  }}, 25]
-                ]
-              }},
-              tex: {{
-                inlineMath: [['\\\\(', '\\\\)']],
-                displayMath: [['\\\\[', '\\\\]']],
-                processEscapes: true
-              }},
-              svg: {{
-                fontCache: 'global'
-              }},
-              options: {{
-                ignoreHtmlClass: 'tex2jax_ignore',
-                processHtmlClass: 'tex2jax_process',
-                menuOptions: {{
-                  settings: {{
-                    assistiveMml: true,
-                    enrich: false
-                  }}
+            block = self._convert_to_html(md_content)
+        except Exception as e:
+            print(f"Markdown render error: {e}")
+            return
+
+        if self._page_ready:
+            self._append_block(block)
+        else:
+            self._pending_blocks.append(block)
+
+    def _append_block(self, block):
+        # Typeset only the new block. If MathJax is still loading,
+        # its startup typeset will include the block anyway.
+        self.page().runJavaScript(f"""
+        (function() {{
+            var el = document.createElement('div');
+            el.innerHTML = {json.dumps(block)};
+            document.body.appendChild(el);
+            if (window.MathJax && MathJax.startup && MathJax.startup.promise) {{
+                MathJax.startup.promise = MathJax.startup.promise.then(() => MathJax.typesetPromise([el]));
+            }}
+        }})();
+        """)
+
+    def _on_load_finished(self, ok):
+        self._page_ready = True
+        for block in self._pending_blocks:
+            self._append_block(block)
+        self._pending_blocks.clear()
+
+    def _set_page(self, html_content):
+        self._page_ready = False
+        self._pending_blocks.clear()
+
+        # 4. Setup MathJax
+        base_path = os.path.dirname(os.path.abspath(__file__))
+        project_path = os.path.dirname(base_path)
+        node_path = os.path.join(project_path, "res", "node")
+
+        mathjax_path = os.path.join(node_path, "mathjax", "tex-mml-svg.js")
+        mathjax_url = QUrl.fromLocalFile(mathjax_path).toString()
+        mathjax_dir_url = QUrl.fromLocalFile(os.path.dirname(mathjax_path)).toString()
+        node_path_url = QUrl.fromLocalFile(node_path).toString()
+
+        # Explicitly map the newcm font to ensure local loading
+        newcm_path = os.path.join(node_path, "@mathjax", "mathjax-newcm-font")
+        newcm_url = QUrl.fromLocalFile(newcm_path).toString()
+
+        # STUPID Hack: catch and replace cdn link with local path (setting paths doesn't work)
+        mathjax_script = f"""
+        <script>
+        MathJax = {{
+          loader: {{
+            paths: {{
+              mathjax: '{mathjax_dir_url}',
+              npm: '{node_path_url}',
+              'mathjax-newcm-font': '{newcm_url}'
+            }},
+            pathFilters: [
+              [(data) => {{
+                var cdn = 'https://cdn.jsdelivr.net/npm/';
+                if (data.name.indexOf(cdn) === 0) {{
+                    data.name = data.name.replace(cdn, '{node_path_url}/');
                 }}
+                return true;
+              }}, 25]
+            ]
+          }},
+          tex: {{
+            inlineMath: [['\\\\(', '\\\\)']],
+            displayMath: [['\\\\[', '\\\\]']],
+            processEscapes: true
+          }},
+          svg: {{
+            fontCache: 'global'
+          }},
+          options: {{
+            ignoreHtmlClass: 'tex2jax_ignore',
+            processHtmlClass: 'tex2jax_process',
+            menuOptions: {{
+              settings: {{
+                assistiveMml: true,
+                enrich: false
               }}
-            }};
-            </script>
-            <script id="MathJax-script" async src="{mathjax_url}"></script>
-            """
+            }}
+          }}
+        }};
+        </script>
+        <script id="MathJax-script" async src="{mathjax_url}"></script>
+        """
 
-            full_html = f"<html><head>{BROWSER_STYLE}{mathjax_script}</head><body>{html_content}</body></html>"
-            self.setHtml(full_html, QUrl.fromLocalFile(project_path))
-        except Exception as e:
-            print(f"Markdown render error: {e}")
+        full_html = f"<html><head>{BROWSER_STYLE}{mathjax_script}</head><body>{html_content}</body></html>"
+        self.setHtml(full_html, QUrl.fromLocalFile(project_path))
 
     def copy_content(self):
         self.setFocus()
@@ -203,6 +240,7 @@ class OutputPanel(QWidget):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.t = {}  # Translation dictionary
+        self._fancy_has_content = False  # Whether any non-blank block was rendered to the fancy tab
 
         # === Tabs ===
         self.tabs = QTabWidget()
@@ -277,20 +315,28 @@ class OutputPanel(QWidget):
         self.text_output.moveCursor(QTextCursor.End)
 
     # ==================== Tab 2: Fancy Output ====================
-    def render_fancy_output(self):
-        # Convert raw text to rendered markdown.
-        raw_md = self.text_output.toPlainText()
-        if not raw_md.strip():
+    def append_fancy_block(self, raw_md):
+        # Render raw text (the output of one finished image) and append it
+        # to the fancy page, so the batch is rendered piece by piece while
+        # processing instead of all at once at the end.
+        if raw_md.strip():
+            self.web_view.append_markdown(raw_md)
+            self._fancy_has_content = True
+
+    def render_fancy_output(self, raw_md=""):
+        # Render the raw text not rendered yet and show the fancy tab.
+        self.append_fancy_block(raw_md)
+        if not self._fancy_has_content:
             return
 
-        self.web_view.set_markdown(raw_md)
         self.tabs.setTabEnabled(1, True)
         self.tabs.setCurrentIndex(1)
 
     # ==================== Utility ====================
     def clear(self):
         self.text_output.clear()
-        self.web_view.set_markdown("")
+        self._fancy_has_content = False
+        self.web_view.start_document()
         self.tabs.setTabEnabled(1, False)
         self.tabs.setCurrentIndex(0)
 
@@ -78,6 +78,8 @@ ITaskbarList3._fields_ = [('lpVtbl', POINTER(ITaskbarList3Vtbl))]
 
 class TaskbarProgress:
     # High-level wrapper for Windows taskbar progress API.
+    __slots__ = ('_taskbar', '_initialized')
+
     def __init__(self):
         self._taskbar = None
         self._initialized = False